@@ -0,0 +1,78 @@
+"""Memory used to hold parsed listings: feature dicts vs. records vs. a columnar batch
+
+Usage: python benchmarks/listing_memory.py [--listings 10000]
+
+Each representation is built from freshly generated features, with every string a
+distinct object as it would be after parsing a page, so the figures include the
+strings each representation keeps alive as well as the containers themselves.
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from trulia_to_notion.record import ListingBatch, ListingRecord
+
+CITIES = ("San Jose", "Fremont", "Milpitas", "Santa Clara", "Sunnyvale")
+
+
+def _make_features(n_listings: int):
+    """Yield feature dicts with freshly allocated strings, as produced by parsing"""
+    rng = random.Random(0)
+    for i in range(n_listings):
+        address = f"{i} Main Street, {rng.choice(CITIES)}, CA 95{i % 1000:03d}"
+        street_address, city, state_zip = address.split(", ")
+        state, zip_code = state_zip.split(" ")
+        description = f"Listing {i}. " + "Single family home. " * rng.randint(20, 60)
+        yield {
+            "address": address,
+            "street_address": street_address,
+            "city": city,
+            "state": state,
+            "zip_code": zip_code,
+            "link": f"https://www.trulia.com/p/ca/{i}",
+            "list_price": float(rng.randrange(900_000, 1_750_000, 1000)),
+            "beds": rng.randint(3, 6),
+            "baths_full": rng.randint(2, 4),
+            "baths_half": rng.randint(0, 1),
+            "garage_spaces": rng.randint(0, 3),
+            "living_area": float(rng.randint(1000, 3500)),
+            "lot_area": float(rng.randint(3000, 12000)),
+            "year_built": rng.randint(1950, 2020),
+            "property_description": description,
+            "raw_feature_notes": f"Cooling: Central;Heating: Forced Air;Lot {i}",
+        }
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", "-n", type=int, default=10_000)
+    args = parser.parse_args()
+
+    n_listings = args.listings
+    results = {
+        "dict": _measure(lambda: list(_make_features(n_listings))),
+        "ListingRecord": _measure(
+            lambda: [ListingRecord(**f) for f in _make_features(n_listings)]
+        ),
+        "ListingBatch": _measure(
+            lambda: ListingBatch(ListingRecord(**f) for f in _make_features(n_listings))
+        ),
+    }
+    scale = 10_000 / n_listings
+    for name, size in results.items():
+        print(f"{name:>14}: {size * scale / 1024 ** 2:8.2f} MiB per 10k listings")
+
+
+if __name__ == "__main__":
+    main()
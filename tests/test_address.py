@@ -0,0 +1,85 @@
+import pytest
+
+from trulia_to_notion.address import AddressIndex, address_key, normalize_address
+
+
+@pytest.mark.parametrize(
+    "address, expected",
+    [
+        (
+            "123 Main St, San Jose, CA 95123",
+            ("123 main street", "san jose", "95123"),
+        ),
+        (
+            "123 N. Main Street, San Jose, CA 95123-1234",
+            ("123 north main street", "san jose", "95123"),
+        ),
+        (
+            "5 Space Park Dr, Santa Clara, CA 95054",
+            ("5 space park drive", "santa clara", "95054"),
+        ),
+        ("1 Suite Ln, Fremont, CA 94536", ("1 suite lane", "fremont", "94536")),
+        (
+            "123 Main St Apt 4, San Jose, CA 95123",
+            ("123 main street #4", "san jose", "95123"),
+        ),
+        (
+            "123 Main St, Unit 4, San Jose, CA 95123",
+            ("123 main street #4", "san jose", "95123"),
+        ),
+        (
+            "123 Main St #4B, San Jose, CA 95123",
+            ("123 main street #4b", "san jose", "95123"),
+        ),
+        ("100 E St, Sacramento, CA 95814", ("100 e street", "sacramento", "95814")),
+        (
+            "100 Main St N, San Jose, CA 95123",
+            ("100 main street north", "san jose", "95123"),
+        ),
+        ("123 Main St", None),
+    ],
+)
+def test_normalize_address(address, expected):
+    assert normalize_address(address) == expected
+
+
+def test_address_key_collapses_variants():
+    assert address_key("123 Main St, San Jose, CA 95123") == address_key(
+        "123 MAIN STREET, San Jose, CA 95123"
+    )
+    assert address_key("123 Main St Apt 4, San Jose, CA 95123") == address_key(
+        "123 Main Street #4, San Jose, CA 95123"
+    )
+
+
+def test_address_key_keeps_directional_streets_apart():
+    assert address_key("100 E St, Sacramento, CA 95814") != address_key(
+        "100 East St, Sacramento, CA 95814"
+    )
+    assert address_key("100 N St, Sacramento, CA 95814") != address_key(
+        "100 North St, Sacramento, CA 95814"
+    )
+    assert address_key("100 N Main St, San Jose, CA 95123") == address_key(
+        "100 North Main Street, San Jose, CA 95123"
+    )
+
+
+def test_address_key_keeps_units_apart():
+    assert address_key("123 Main St Apt 4, San Jose, CA 95123") != address_key(
+        "123 Main St Apt 5, San Jose, CA 95123"
+    )
+    assert address_key("123 Main St Apt 4, San Jose, CA 95123") != address_key(
+        "123 Main St, San Jose, CA 95123"
+    )
+
+
+def test_address_index_falls_back_to_link():
+    index = AddressIndex()
+    index.add("1 Elm Ave, San Jose, CA 95123", "page", 1000.0, "https://t/l1")
+
+    assert index.get("1 Elm Avenue, San Jose, CA 95123") == ("page", 1000.0)
+    assert index.get("999 Other Rd, San Jose, CA 95123", "https://t/l1") == (
+        "page",
+        1000.0,
+    )
+    assert index.get("999 Other Rd, San Jose, CA 95123", "https://t/l2") is None
@@ -0,0 +1,171 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from trulia_to_notion import mutation_queue  # noqa: E402
+from trulia_to_notion.mutation_queue import MutationQueue, flush  # noqa: E402
+
+ADDRESS = "1 Main St, San Jose, CA 95123"
+
+
+def _create_payload(price):
+    return {
+        "parent": {"database_id": "db"},
+        "properties": {
+            "Address": {"rich_text": [{"text": {"content": ADDRESS}}]},
+            "Listing Price": {"number": price},
+        },
+        "children": [f"description {price}"],
+    }
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": retry_after} if retry_after else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeNotion:
+    def __init__(self, existing=None, statuses=None):
+        self.existing = existing or {}
+        self.statuses = list(statuses or [])
+        self.calls = []
+        self.index_builds = 0
+
+    def _respond(self):
+        return FakeResponse(*self.statuses.pop(0)) if self.statuses else FakeResponse()
+
+    def build_address_index(self):
+        self.index_builds += 1
+
+    def get_existing_listing(self, address):
+        return self.existing.get(address)
+
+    def create_page(self, payload):
+        self.calls.append(("create", payload))
+        return self._respond()
+
+    def patch_page_properties(self, page_id, properties):
+        self.calls.append(("patch", page_id, properties))
+        return self._respond()
+
+    def replace_page_children(self, page_id, children):
+        self.calls.append(("children", page_id, children))
+        yield self._respond()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = MutationQueue(tmp_path / "queue.sqlite")
+    yield queue
+    queue.close()
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(mutation_queue.time, "sleep", lambda seconds: None)
+
+
+def test_pending_coalesces_mutations_per_page(queue):
+    queue.create_page("k1", _create_payload(1))
+    queue.update_properties("p1", {"Beds": 3})
+    queue.replace_children("p1", ["old"])
+    queue.create_page("k1", _create_payload(2))
+    queue.update_properties("p1", {"Baths": 2})
+    queue.replace_children("p1", ["new"])
+
+    pages = queue.pending()
+
+    assert [page["page_key"] for page in pages] == ["new:k1", "page:p1"]
+    assert pages[0]["ids"] == [1, 4]
+    assert pages[0]["create"] == {"parent": {"database_id": "db"}}
+    assert pages[0]["properties"]["Listing Price"] == {"number": 2}
+    assert pages[0]["children"] == ["description 2"]
+    assert pages[1]["properties"] == {"Beds": 3, "Baths": 2}
+    assert pages[1]["children"] == ["new"]
+
+
+def test_flush_sends_one_request_per_coalesced_page(queue):
+    queue.create_page("k1", _create_payload(1))
+    queue.create_page("k1", _create_payload(2))
+    queue.update_properties("p1", {"Beds": 3})
+    queue.update_properties("p1", {"Baths": 2})
+    notion = FakeNotion()
+
+    summary = flush(queue, notion, max_workers=1)
+
+    assert summary == {"written": 2, "failed": 0, "pending": 0}
+    assert notion.calls == [
+        ("create", _create_payload(2)),
+        ("patch", "p1", {"Beds": 3, "Baths": 2}),
+    ]
+    assert notion.index_builds == 0
+
+
+def test_flush_retries_after_rate_limit(queue):
+    queue.update_properties("p1", {"Beds": 3})
+    notion = FakeNotion(statuses=[(429, "0.5")])
+
+    summary = flush(queue, notion, max_workers=1)
+
+    assert summary == {"written": 1, "failed": 0, "pending": 0}
+    assert len(notion.calls) == 2
+
+
+def test_flush_stops_when_still_rate_limited_and_resumes(queue):
+    queue.update_properties("p1", {"Beds": 3})
+    queue.update_properties("p2", {"Beds": 4})
+    attempts = mutation_queue.MAX_RATE_LIMIT_RETRIES + 1
+    notion = FakeNotion(statuses=[(429, "1")] * attempts)
+
+    summary = flush(queue, notion, max_workers=1)
+
+    assert summary == {"written": 0, "failed": 0, "pending": 2}
+    assert {call[1] for call in notion.calls} == {"p1"}
+
+    notion = FakeNotion()
+    summary = flush(queue, notion, max_workers=1)
+
+    assert summary == {"written": 2, "failed": 0, "pending": 0}
+    assert [call[1] for call in notion.calls] == ["p1", "p2"]
+
+
+def test_flush_merges_interrupted_create_into_existing_page(queue):
+    # A previous flush sent this create, then stopped before removing it
+    queue.create_page("k1", _create_payload(1))
+    queue.mark_attempted([1])
+    # The next run found the created page and queued an update to it
+    queue.update_properties("p1", {"Listing Price": {"number": 2}})
+    queue.replace_children("p1", ["updated"])
+    notion = FakeNotion(existing={ADDRESS: "p1"})
+
+    summary = flush(queue, notion, max_workers=2)
+
+    assert summary == {"written": 1, "failed": 0, "pending": 0}
+    assert notion.index_builds == 1
+    assert notion.calls == [
+        (
+            "patch",
+            "p1",
+            {
+                "Address": {"rich_text": [{"text": {"content": ADDRESS}}]},
+                "Listing Price": {"number": 2},
+            },
+        ),
+        ("children", "p1", ["updated"]),
+    ]
+
+
+def test_flush_recreates_interrupted_create_missing_from_notion(queue):
+    queue.create_page("k1", _create_payload(1))
+    queue.mark_attempted([1])
+    notion = FakeNotion()
+
+    summary = flush(queue, notion, max_workers=1)
+
+    assert summary == {"written": 1, "failed": 0, "pending": 0}
+    assert notion.calls == [("create", _create_payload(1))]
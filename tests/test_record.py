@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from trulia_to_notion.record import ListingRecord  # noqa: E402
+
+REQUIRED = {
+    "address": "1 Main St, San Jose, CA 95123",
+    "street_address": "1 Main St",
+    "city": "San Jose",
+    "state": "CA",
+    "zip_code": "95123",
+    "list_price": "1200000",
+}
+
+
+def test_coerces_fields():
+    record = ListingRecord(**REQUIRED, beds="3", baths_full=2, baths_half=1.0)
+
+    assert record["list_price"] == 1200000.0
+    assert record.beds == 3
+    assert record.baths == 2.5
+    assert record.year_built == 0
+
+
+def test_rejects_missing_required_field():
+    with pytest.raises(ValueError, match="zip_code"):
+        ListingRecord(**dict(REQUIRED, zip_code=None))
+    with pytest.raises(ValueError, match="city"):
+        ListingRecord(**{k: v for k, v in REQUIRED.items() if k != "city"})
+
+
+def test_rejects_non_integral_int():
+    with pytest.raises(ValueError, match="beds"):
+        ListingRecord(**REQUIRED, beds=3.7)
+    record = ListingRecord(**REQUIRED)
+    with pytest.raises(ValueError):
+        record["garage_spaces"] = 1.5
+
+
+def test_dict_compatibility():
+    record = ListingRecord(**REQUIRED, source="archive")
+    record.update({"beds": 4, "note": "x"})
+    copy = record.copy()
+    del copy["note"]
+
+    assert record["beds"] == 4
+    assert record["note"] == "x"
+    assert "note" not in copy
+    assert dict(copy)["source"] == "archive"
+    with pytest.raises(KeyError):
+        del copy["beds"]
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+bs4 = pytest.importorskip("bs4")
+
+from trulia_to_notion.trulia import TruliaConnection  # noqa: E402
+
+SEARCH_DOCUMENT = """
+<ul>
+  <li>
+    <div>
+      <a data-testid="property-card-link" href="/p/ca/1"></a>
+      <div data-testid="property-price">$1,200,000</div>
+      <div data-testid="property-street">1 Main St</div>
+      <div data-testid="property-region">San Jose, CA 95123</div>
+    </div>
+  </li>
+  <li>
+    <div>
+      <a data-testid="property-card-link" href="/p/ca/2"></a>
+    </div>
+  </li>
+</ul>
+"""
+
+
+def test_retrieve_listing_cards():
+    document = bs4.BeautifulSoup(SEARCH_DOCUMENT, "html.parser")
+
+    cards = TruliaConnection.retrieve_listing_cards("https://t", document)
+
+    assert cards == [
+        {
+            "link": "https://t/p/ca/1",
+            "address": "1 Main St, San Jose, CA 95123",
+            "list_price": 1200000.0,
+        },
+        # A card without street or price doesn't borrow them from its neighbours
+        {"link": "https://t/p/ca/2", "address": None, "list_price": None},
+    ]
+    assert TruliaConnection.retrieve_listings_links("https://t", document) == [
+        "https://t/p/ca/1",
+        "https://t/p/ca/2",
+    ]
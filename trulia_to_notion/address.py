@@ -0,0 +1,214 @@
+"""Address normalization and duplicate listing index
+
+Listings are matched on a normalized (street, city, zip code) key rather than the raw
+address string so that relistings and abbreviation variants such as "St" and "Street"
+resolve to the same property. Unit designators ("Apt 4", "Unit 4") are rewritten to a
+single "#4" form, keeping different units of a building apart.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Street suffix abbreviations, mapped to a single canonical spelling
+SUFFIX_ABBREVIATIONS = {
+    "ave": "avenue",
+    "av": "avenue",
+    "blvd": "boulevard",
+    "cir": "circle",
+    "ct": "court",
+    "cv": "cove",
+    "dr": "drive",
+    "expy": "expressway",
+    "hwy": "highway",
+    "ln": "lane",
+    "pkwy": "parkway",
+    "pl": "place",
+    "rd": "road",
+    "sq": "square",
+    "st": "street",
+    "ter": "terrace",
+    "trl": "trail",
+    "way": "way",
+}
+
+# Directional abbreviations, mapped to a single canonical spelling
+DIRECTIONAL_ABBREVIATIONS = {
+    "n": "north",
+    "s": "south",
+    "e": "east",
+    "w": "west",
+    "ne": "northeast",
+    "nw": "northwest",
+    "se": "southeast",
+    "sw": "southwest",
+}
+
+# Words a unit designator may follow within the street part of an address
+STREET_SUFFIXES = {
+    *SUFFIX_ABBREVIATIONS,
+    *SUFFIX_ABBREVIATIONS.values(),
+    *DIRECTIONAL_ABBREVIATIONS,
+    *DIRECTIONAL_ABBREVIATIONS.values(),
+}
+
+RE_UNIT_DESIGNATOR = r"(?:#|(?P<DESIGNATOR>apt|unit|ste|suite|spc|space)\b\.?)\s*#?\s*"
+# Unit in its own comma-separated part, e.g. "123 Main St, Apt 4, ..."
+RE_UNIT_PART = re.compile(rf"^{RE_UNIT_DESIGNATOR}(?P<UNIT>[\w-]+)$", re.I)
+# Unit at the end of the street part, e.g. "123 Main St Apt 4" or "123 Main St #4"
+RE_TRAILING_UNIT = re.compile(
+    rf"^(?P<STREET>.+?)\s+{RE_UNIT_DESIGNATOR}(?P<UNIT>[\w-]+)$", re.I
+)
+RE_STATE_ZIP = re.compile(r"^(?P<STATE>[A-Za-z]{2})\s+(?P<ZIP_CODE>\d{5})")
+RE_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def _tokenize(value: str) -> List[str]:
+    return RE_NON_WORD.sub(" ", value.lower()).split()
+
+
+def _has_name(tokens: List[str]) -> bool:
+    return any(token not in STREET_SUFFIXES for token in tokens)
+
+
+def _normalize_street_tokens(street: str) -> List[str]:
+    """
+    Expand abbreviations only where their meaning is unambiguous: a street suffix as
+    the last token (before any trailing directional), and a directional before or
+    after a remaining street name. "E St" and "East St" therefore stay different
+    streets, while "N Main St" and "North Main Street" match.
+    """
+    tokens = _tokenize(street)
+    start = 1 if tokens and tokens[0][0].isdigit() else 0
+    end = len(tokens)
+
+    # Trailing directional, e.g. "Main St N"
+    if (
+        end - start >= 2
+        and tokens[end - 1] in DIRECTIONAL_ABBREVIATIONS
+        and _has_name(tokens[start : end - 1])
+    ):
+        tokens[end - 1] = DIRECTIONAL_ABBREVIATIONS[tokens[end - 1]]
+        end -= 1
+
+    # Street suffix, e.g. "Main St"
+    if end - start >= 2 and tokens[end - 1] in SUFFIX_ABBREVIATIONS:
+        tokens[end - 1] = SUFFIX_ABBREVIATIONS[tokens[end - 1]]
+        end -= 1
+
+    # Leading directional, e.g. "N Main"
+    if (
+        end - start >= 2
+        and tokens[start] in DIRECTIONAL_ABBREVIATIONS
+        and _has_name(tokens[start + 1 : end])
+    ):
+        tokens[start] = DIRECTIONAL_ABBREVIATIONS[tokens[start]]
+    return tokens
+
+
+def _normalize_street(street_parts: List[str]) -> str:
+    """
+    Normalize the street parts of an address, rewriting any unit to "#<unit>". A
+    designator word is only treated as a unit when it follows a street suffix or
+    directional, or stands in its own part, so street names such as "Space Park Dr"
+    are left intact.
+    """
+    street, *extra_parts = street_parts
+    unit = None
+    remaining_parts = []
+    for part in extra_parts:
+        unit_part = RE_UNIT_PART.match(part)
+        if unit_part:
+            unit = unit_part.group("UNIT")
+        else:
+            remaining_parts.append(part)
+
+    trailing_unit = RE_TRAILING_UNIT.match(street)
+    if trailing_unit:
+        preceding = _tokenize(trailing_unit.group("STREET"))[-1:]
+        if not trailing_unit.group("DESIGNATOR") or (
+            preceding and preceding[0] in STREET_SUFFIXES
+        ):
+            street = trailing_unit.group("STREET")
+            unit = trailing_unit.group("UNIT")
+
+    street = " ".join(
+        _normalize_street_tokens(street)
+        + [token for part in remaining_parts for token in _tokenize(part)]
+    )
+    if unit:
+        street = f"{street} #{unit.lower()}"
+    return street
+
+
+def normalize_address(address: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Normalize a 'street, city, state zip' address string
+
+    :return (street, city, zip code) tuple, or None if the address can't be parsed
+    """
+    parts = [part.strip() for part in address.split(",")]
+    if len(parts) < 3:
+        return None
+    state_zip = RE_STATE_ZIP.match(parts[-1])
+    if not state_zip:
+        return None
+
+    street = _normalize_street(parts[:-2])
+    city = " ".join(_tokenize(parts[-2]))
+    if not street or not city:
+        return None
+    return street, city, state_zip.group("ZIP_CODE")
+
+
+def address_key(address: str) -> Optional[str]:
+    """Hashed index key for an address. Returns None if the address can't be parsed"""
+    normalized = normalize_address(address)
+    if normalized is None:
+        return None
+    return hashlib.blake2b("|".join(normalized).encode(), digest_size=8).hexdigest()
+
+
+class AddressIndex:
+    """
+    Index of known listings keyed by normalized address and by listing URL
+
+    Each entry maps to the Notion page id (None for listings not yet in Notion) and
+    last known listing price.
+    """
+
+    def __init__(self):
+        self._by_address: Dict[str, Tuple[Optional[str], Optional[float]]] = {}
+        self._by_link: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self._by_address)
+
+    def add(
+        self,
+        address: str,
+        page_id: Optional[str] = None,
+        list_price: Optional[float] = None,
+        link: Optional[str] = None,
+    ) -> Optional[str]:
+        """Add a listing to the index. Returns the index key, if any"""
+        key = address_key(address)
+        if key is None:
+            return None
+        self._by_address[key] = (page_id, list_price)
+        if link:
+            self._by_link[link] = key
+        return key
+
+    def get(
+        self, address: Optional[str] = None, link: Optional[str] = None
+    ) -> Optional[Tuple[Optional[str], Optional[float]]]:
+        """Look up (page id, listing price) by address, falling back to listing URL"""
+        key = address_key(address) if address else None
+        if key is not None and key in self._by_address:
+            return self._by_address[key]
+        if link and link in self._by_link:
+            return self._by_address.get(self._by_link[link])
+        return None
+
+    def __contains__(self, address: str):
+        return self.get(address) is not None
@@ -0,0 +1,191 @@
+"""Offline parsing of saved Trulia listing pages
+
+Streams a directory or tar archive of saved listing HTML documents through
+`Listing.parse_listing` across multiple processes and writes the resulting feature
+dictionaries to NDJSON or Parquet in a single pass. At most a fixed number of
+documents are in flight at a time, with a new document submitted as each result comes
+back, so memory use stays bounded regardless of corpus size.
+"""
+import json
+import logging
+import os
+import tarfile
+import time
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from trulia_to_notion.record import LISTING_FIELDS, ListingBatch, ListingRecord
+from trulia_to_notion.trulia import Listing
+
+logger = logging.getLogger(__name__)
+
+
+HTML_SUFFIXES = (".html", ".htm")
+OUTPUT_FORMATS = ("ndjson", "parquet")
+
+# Parquet column types for each listing field type
+PARQUET_TYPES = {str: "string", int: "int64", float: "float64"}
+
+
+def iter_documents(path: Path) -> Iterator[Tuple[str, str]]:
+    """Yield (name, HTML text) for every saved listing in a directory or tar archive"""
+    path = Path(path)
+    if path.is_dir():
+        for document_path in sorted(path.rglob("*")):
+            if document_path.is_file() and document_path.suffix in HTML_SUFFIXES:
+                yield str(document_path), document_path.read_text(errors="replace")
+    elif tarfile.is_tarfile(path):
+        # Stream mode reads members sequentially without loading the member index
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.endswith(HTML_SUFFIXES):
+                    continue
+                member_fh = archive.extractfile(member)
+                yield member.name, member_fh.read().decode(errors="replace")
+    else:
+        raise ValueError(f"Corpus must be a directory or tar archive: {path}")
+
+
+def _get_canonical_link(document: BeautifulSoup) -> Optional[str]:
+    """Get the canonical listing URL recorded in a saved page, if any"""
+    canonical = document.find("link", rel="canonical", href=True)
+    if canonical:
+        return canonical["href"]
+    return None
+
+
+def _init_worker():
+    """Silence per-listing progress logging, one line per document, in workers"""
+    logging.getLogger("trulia_to_notion.trulia").setLevel(logging.WARNING)
+
+
+def parse_document(named_document: Tuple[str, str]) -> Optional[ListingRecord]:
+    """Parse a single saved listing document. Returns None if the page can't be parsed"""
+    name, text = named_document
+    document = BeautifulSoup(text, "html.parser")
+    link = _get_canonical_link(document) or name
+    try:
+        return Listing(document, link).features
+    except Exception:
+        logger.error(f"Error parsing listing information for {name=}")
+        return None
+
+
+class _NDJSONWriter:
+    def __init__(self, output: Path):
+        self._output_fh = open(output, "w")
+
+    def write(self, features: ListingRecord):
+        self._output_fh.write(json.dumps(dict(features)) + "\n")
+
+    def close(self):
+        self._output_fh.close()
+
+
+class _ParquetWriter:
+    def __init__(self, output: Path, row_group_size: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Parquet output requires 'pyarrow'") from error
+
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                (field, pa.type_for_alias(PARQUET_TYPES[field_type]))
+                for field, field_type in LISTING_FIELDS.items()
+            ]
+        )
+        self._writer = pq.ParquetWriter(output, self._schema)
+        self._row_group_size = row_group_size
+        self._batch = ListingBatch()
+
+    def write(self, features: ListingRecord):
+        self._batch.append(features)
+        if len(self._batch) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if len(self._batch):
+            table = self._pa.Table.from_pydict(
+                self._batch.to_arrays(), schema=self._schema
+            )
+            self._writer.write_table(table)
+            self._batch.clear()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def parse_corpus(
+    corpus: Path,
+    output: Path,
+    output_format: str = "ndjson",
+    processes: Optional[int] = None,
+    batch_size: int = 256,
+) -> Dict[str, float]:
+    """
+    Parse every saved listing in a corpus and write the features to disk
+
+    :param corpus: Directory or tar archive of saved listing HTML documents
+    :param output: Path to output file
+    :param output_format: One of 'ndjson' or 'parquet'
+    :param processes: Number of worker processes (defaults to CPU count)
+    :param batch_size: Maximum number of documents in flight at a time; also used as
+        the Parquet row group size
+
+    :return Summary of documents parsed, failures and throughput
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}")
+
+    if output_format == "parquet":
+        writer = _ParquetWriter(output, row_group_size=batch_size)
+    else:
+        writer = _NDJSONWriter(output)
+
+    processes = processes or os.cpu_count() or 1
+    window = max(1, batch_size)
+
+    n_documents = 0
+    n_failed = 0
+    start = time.perf_counter()
+    try:
+        with Pool(processes, initializer=_init_worker) as pool:
+            documents = iter_documents(corpus)
+            pending = deque()
+            while True:
+                # Keep the window full so workers never wait on the reader
+                while len(pending) < window:
+                    document = next(documents, None)
+                    if document is None:
+                        break
+                    pending.append(pool.apply_async(parse_document, (document,)))
+                if not pending:
+                    break
+
+                features = pending.popleft().get()
+                n_documents += 1
+                if features is None:
+                    n_failed += 1
+                    continue
+                writer.write(features)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "documents": n_documents,
+        "parsed": n_documents - n_failed,
+        "failed": n_failed,
+        "seconds": elapsed,
+        "documents_per_second": n_documents / elapsed if elapsed else 0.0,
+    }
+    logger.info(summary)
+    return summary
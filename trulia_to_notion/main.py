@@ -11,6 +11,8 @@ from trulia_to_notion.constants import (
     TRULIA_BASE_URL,
     TRULIA_QUERY_ENDPOINT,
 )
+from trulia_to_notion.corpus import OUTPUT_FORMATS, parse_corpus
+from trulia_to_notion.mutation_queue import MutationQueue, flush
 from trulia_to_notion.notion import NotionRealEstateDB
 from trulia_to_notion.train import train_classifier
 from trulia_to_notion.trulia import TruliaConnection
@@ -37,8 +39,70 @@ def _get_parser():
         type=int,
         default=10,
     )
+    get_listings_cmd.add_argument(
+        "--queue",
+        help="Path to write-ahead queue of Notion writes, flushed after scraping",
+        type=Path,
+        default=None,
+    )
+    get_listings_cmd.add_argument(
+        "--workers",
+        help="Number of concurrent Notion writers when flushing the queue",
+        type=int,
+        default=3,
+    )
     get_listings_cmd.set_defaults(func=_get_listings)
 
+    # Flush queued Notion writes
+    flush_queue_cmd = subparsers.add_parser("flush-queue")
+    flush_queue_cmd.add_argument(
+        "queue",
+        help="Path to write-ahead queue of Notion writes",
+        type=Path,
+    )
+    flush_queue_cmd.add_argument(
+        "--workers",
+        help="Number of concurrent Notion writers",
+        type=int,
+        default=3,
+    )
+    flush_queue_cmd.set_defaults(func=_flush_queue)
+
+    # Parse saved listings offline
+    parse_corpus_cmd = subparsers.add_parser("parse-corpus")
+    parse_corpus_cmd.add_argument(
+        "corpus",
+        help="Path to directory or tar archive of saved Trulia listing HTML documents",
+        type=Path,
+    )
+    parse_corpus_cmd.add_argument(
+        "--output",
+        "-o",
+        help="Path to output file for parsed listing features",
+        type=Path,
+        required=True,
+    )
+    parse_corpus_cmd.add_argument(
+        "--format",
+        help="Output file format",
+        choices=OUTPUT_FORMATS,
+        default="ndjson",
+    )
+    parse_corpus_cmd.add_argument(
+        "--processes",
+        "-p",
+        help="Number of parser processes (defaults to CPU count)",
+        type=int,
+        default=None,
+    )
+    parse_corpus_cmd.add_argument(
+        "--batch-size",
+        help="Number of documents held in memory at a time",
+        type=int,
+        default=256,
+    )
+    parse_corpus_cmd.set_defaults(func=_parse_corpus)
+
     # Train classifier
     train_classifier_cmd = subparsers.add_parser("train-classifier")
     train_classifier_cmd.add_argument(
@@ -70,18 +134,44 @@ def _get_parser():
 
 def _get_listings(args):
     """Generate list of latest listings from Trulia and add to Notion database"""
-    # Generate list of latest listings
+    write_queue = MutationQueue(args.queue) if args.queue else None
+    notion = NotionRealEstateDB(NOTION_BASE_URL, NOTION_DATABASE_ID, write_queue)
+
+    # Generate list of latest listings, skipping those already in the database
     trulia = TruliaConnection(TRULIA_BASE_URL, document=args.document)
     listings = trulia.get_listings(
         query_url=f"{TRULIA_BASE_URL}/{TRULIA_QUERY_ENDPOINT}",
         max_listings=args.max_listings,
+        index=notion.address_index,
     )
 
     # Add listings to database
-    notion = NotionRealEstateDB(NOTION_BASE_URL, NOTION_DATABASE_ID)
     for listing in listings:
         notion.add_listing(listing)
 
+    if write_queue is not None:
+        flush(write_queue, notion, max_workers=args.workers)
+        write_queue.close()
+
+
+def _flush_queue(args):
+    """Send queued writes to Notion database"""
+    write_queue = MutationQueue(args.queue)
+    notion = NotionRealEstateDB(NOTION_BASE_URL, NOTION_DATABASE_ID)
+    flush(write_queue, notion, max_workers=args.workers)
+    write_queue.close()
+
+
+def _parse_corpus(args):
+    """Parse a corpus of saved listings and write features to disk"""
+    parse_corpus(
+        args.corpus,
+        args.output,
+        output_format=args.format,
+        processes=args.processes,
+        batch_size=args.batch_size,
+    )
+
 
 def _train_classifier(args):
     """Train and write to disk a logistic regression model"""
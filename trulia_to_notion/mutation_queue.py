@@ -0,0 +1,289 @@
+"""Durable write-ahead queue of Notion mutations
+
+Page creations, property patches and child block replacements are appended to a local
+SQLite queue instead of being sent to Notion immediately. `flush` later drains the
+queue with concurrent workers, coalescing all pending mutations for the same page into
+as few requests as possible. Mutations are only removed once Notion has accepted them,
+so a run that crashes or is aborted by rate limiting resumes where it stopped.
+Rate-limited requests are retried after Notion's Retry-After delay, with every worker
+pausing until then, before a flush gives up.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+CREATE = "create"
+UPDATE_PROPERTIES = "update_properties"
+REPLACE_CHILDREN = "replace_children"
+
+# Key prefixes for pages that do or don't exist in Notion yet
+PAGE_KEY = "page:"
+NEW_PAGE_KEY = "new:"
+
+# Retries of a rate-limited page before the flush is stopped, and the delay used when
+# Notion doesn't send Retry-After
+MAX_RATE_LIMIT_RETRIES = 3
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class RateLimited(Exception):
+    """Notion responded with HTTP 429"""
+
+    def __init__(self, retry_after: Optional[str] = None):
+        super().__init__(retry_after)
+        try:
+            self.retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            self.retry_after = DEFAULT_RETRY_AFTER
+
+
+class _Backoff:
+    """Shared pause so all workers wait out a rate limit together"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MutationQueue:
+    def __init__(self, path: Path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS mutations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " page_key TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL"
+            ")"
+        )
+        self._connection.commit()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM mutations").fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    def _append(self, page_key: str, kind: str, payload: Dict):
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO mutations (page_key, kind, payload, created)"
+                " VALUES (?, ?, ?, ?)",
+                (page_key, kind, json.dumps(payload), time.time()),
+            )
+
+    def create_page(self, key: str, payload: Dict):
+        """
+        Queue a page creation. `key` identifies the new page (e.g. its normalized
+        address) so that repeated creations of the same page are coalesced.
+        """
+        self._append(f"{NEW_PAGE_KEY}{key}", CREATE, payload)
+
+    def update_properties(self, page_id: str, properties: Dict):
+        """Queue a patch of an existing page's properties"""
+        self._append(f"{PAGE_KEY}{page_id}", UPDATE_PROPERTIES, properties)
+
+    def replace_children(self, page_id: str, children: List[Dict]):
+        """Queue replacement of all child blocks of an existing page"""
+        self._append(f"{PAGE_KEY}{page_id}", REPLACE_CHILDREN, children)
+
+    def pending(self, aliases: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Pending mutations coalesced per page, in order of first enqueue
+
+        :param aliases: Page keys to merge into another page's mutations, e.g. a queued
+            creation that turned out to exist already, mapped to that page's key
+        """
+        aliases = aliases or {}
+        rows = self._connection.execute(
+            "SELECT id, page_key, kind, payload, attempts FROM mutations ORDER BY id"
+        ).fetchall()
+        pages = {}
+        for row_id, page_key, kind, payload, attempts in rows:
+            page_key = aliases.get(page_key, page_key)
+            page = pages.setdefault(
+                page_key,
+                {
+                    "page_key": page_key,
+                    "ids": [],
+                    "create": None,
+                    "properties": {},
+                    "children": None,
+                    "attempted": False,
+                },
+            )
+            payload = json.loads(payload)
+            page["ids"].append(row_id)
+            page["attempted"] |= attempts > 0
+            if kind == CREATE:
+                # A repeated create supersedes everything queued before it
+                page.update(
+                    create=payload,
+                    properties=payload.pop("properties", {}),
+                    children=payload.pop("children", None),
+                )
+            elif kind == UPDATE_PROPERTIES:
+                page["properties"].update(payload)
+            elif kind == REPLACE_CHILDREN:
+                page["children"] = payload
+        return list(pages.values())
+
+    def mark_attempted(self, ids: List[int]):
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE mutations SET attempts = attempts + 1 WHERE id = ?",
+                [(row_id,) for row_id in ids],
+            )
+
+    def remove(self, ids: List[int]):
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM mutations WHERE id = ?", [(row_id,) for row_id in ids]
+            )
+
+
+def _raise_for_status(response: requests.Response):
+    if response.status_code == 429:
+        raise RateLimited(response.headers.get("Retry-After"))
+    response.raise_for_status()
+
+
+def _apply(notion, page: Dict):
+    """Send one coalesced page mutation to Notion"""
+    page_id = None
+    if page["page_key"].startswith(PAGE_KEY):
+        page_id = page["page_key"][len(PAGE_KEY) :]
+
+    if page_id is None:
+        payload = dict(page["create"], properties=page["properties"])
+        if page["children"] is not None:
+            payload["children"] = page["children"]
+        _raise_for_status(notion.create_page(payload))
+        return
+
+    if page["properties"]:
+        _raise_for_status(notion.patch_page_properties(page_id, page["properties"]))
+    if page["children"] is not None:
+        for response in notion.replace_page_children(page_id, page["children"]):
+            _raise_for_status(response)
+
+
+def _apply_with_retry(notion, page: Dict, backoff: _Backoff):
+    """
+    Send a page mutation, retrying after Notion's Retry-After delay when rate limited.
+    Every mutation is safe to repeat: a rate-limited create didn't create the page, and
+    property patches and child block replacements are idempotent.
+    """
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        backoff.wait()
+        try:
+            return _apply(notion, page)
+        except RateLimited as error:
+            if attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            logger.info(f"Rate limited, retrying in {error.retry_after}s")
+            backoff.pause(error.retry_after)
+
+
+def _resolve_created_pages(queue: MutationQueue, notion) -> Dict[str, str]:
+    """
+    Find queued creations that a previous run already sent, and map them to the key of
+    the page Notion created so they're merged with any later mutations of that page
+    """
+    attempted = [
+        page
+        for page in queue.pending()
+        if page["attempted"] and page["page_key"].startswith(NEW_PAGE_KEY)
+    ]
+    if not attempted:
+        return {}
+
+    notion.build_address_index()
+    aliases = {}
+    for page in attempted:
+        address = page["properties"]["Address"]["rich_text"][0]["text"]["content"]
+        page_id = notion.get_existing_listing(address)
+        if page_id:
+            aliases[page["page_key"]] = f"{PAGE_KEY}{page_id}"
+    return aliases
+
+
+def flush(queue: MutationQueue, notion, max_workers: int = 3) -> Dict[str, int]:
+    """
+    Drain the queue into Notion using concurrent workers
+
+    Each page is handled by a single worker so its mutations stay ordered. Creations
+    sent by an earlier, interrupted flush are resolved to their Notion page first, so
+    they're merged with that page's later mutations rather than written concurrently.
+    Rate-limited pages are retried after Notion's Retry-After delay; if a page is still
+    rate limited after MAX_RATE_LIMIT_RETRIES, no further work is submitted and unsent
+    mutations stay queued for the next flush.
+
+    :param queue: Queue of pending mutations
+    :param notion: NotionRealEstateDB the mutations are sent through
+    :param max_workers: Number of concurrent requests
+
+    :return Counts of pages written, failed and left pending
+    """
+    pages = queue.pending(aliases=_resolve_created_pages(queue, notion))
+    logger.info(f"Flushing {len(pages)} pending page mutations")
+
+    backoff = _Backoff()
+    written = 0
+    failed = 0
+    rate_limited = False
+    with ThreadPoolExecutor(max_workers) as executor:
+        remaining = iter(pages)
+        running = {}
+        while True:
+            while not rate_limited and len(running) < max_workers:
+                page = next(remaining, None)
+                if page is None:
+                    break
+                queue.mark_attempted(page["ids"])
+                future = executor.submit(_apply_with_retry, notion, page, backoff)
+                running[future] = page
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = running.pop(future)
+                try:
+                    future.result()
+                except RateLimited:
+                    logger.warning("Still rate limited by Notion, stopping flush")
+                    rate_limited = True
+                except Exception:
+                    logger.exception(f"Error writing {page['page_key']}")
+                    failed += 1
+                else:
+                    queue.remove(page["ids"])
+                    written += 1
+
+    summary = {"written": written, "failed": failed, "pending": len(queue)}
+    logger.info(summary)
+    return summary
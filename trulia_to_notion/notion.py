@@ -1,11 +1,14 @@
 import json
 import logging
-from typing import Dict, Optional, Sequence, Union
+from typing import Dict, Iterator, List, Optional, Sequence, Union
 
 import pandas as pd
 import requests
 
+from trulia_to_notion.address import AddressIndex, address_key
 from trulia_to_notion.constants import NOTION_HEADERS
+from trulia_to_notion.mutation_queue import MutationQueue
+from trulia_to_notion.record import ListingRecord
 from trulia_to_notion.trulia import Listing
 
 logger = logging.getLogger(__name__)
@@ -27,13 +30,24 @@ def _numeric_property(content: Union[int, float]):
 
 
 class NotionRealEstateDB:
-    def __init__(self, base_url: str, database_id: str):
+    def __init__(
+        self,
+        base_url: str,
+        database_id: str,
+        write_queue: Optional[MutationQueue] = None,
+    ):
+        """
+        :param write_queue: If given, page writes are queued here for a later flush
+            instead of being sent immediately
+        """
         self.base_url = base_url
         self.database_id = database_id
+        self.write_queue = write_queue
 
         self.database_url = f"{self.base_url}/databases/{self.database_id}"
         self.page_url = f"{self.base_url}/pages"
         self.block_url = f"{self.base_url}/blocks"
+        self._address_index = None
 
         # Check database connection
         self.get_database()
@@ -69,6 +83,46 @@ class NotionRealEstateDB:
         data = pd.DataFrame(page_properties)
         return data
 
+    @property
+    def address_index(self) -> AddressIndex:
+        """Index of existing listings by normalized address, built on first use"""
+        if self._address_index is None:
+            self.build_address_index()
+        return self._address_index
+
+    def build_address_index(self) -> AddressIndex:
+        """
+        Query every page in the database and index it by normalized address, replacing
+        any index built before
+        """
+        index = AddressIndex()
+        query = {}
+        while True:
+            response = requests.post(
+                f"{self.database_url}/query",
+                data=json.dumps(query),
+                headers=NOTION_HEADERS,
+            )
+            response.raise_for_status()
+            results = response.json()
+            for page in results.get("results", []):
+                properties = page.get("properties", {})
+                address = properties.get("Address", {}).get("rich_text", [])
+                if not address:
+                    continue
+                index.add(
+                    address[0]["text"]["content"],
+                    page_id=page["id"],
+                    list_price=properties.get("Listing Price", {}).get("number"),
+                    link=properties.get("Link", {}).get("url"),
+                )
+            if not results.get("has_more"):
+                break
+            query = {"start_cursor": results["next_cursor"]}
+        logger.info(f"Indexed {len(index)} existing listings")
+        self._address_index = index
+        return index
+
     @staticmethod
     def _paragraph_block(content: str):
         return {
@@ -91,7 +145,7 @@ class NotionRealEstateDB:
             },
         }
 
-    def _make_listing_payload(self, features: Dict):
+    def _make_listing_payload(self, features: ListingRecord):
         """
         Create page creation payload
 
@@ -124,12 +178,12 @@ class NotionRealEstateDB:
             "Listing Price": _numeric_property(features["list_price"]),
             "Beds": _numeric_property(features["beds"]),
             "Baths": _numeric_property(
-                float(features["baths_full"]) + (float(features["baths_half"]) * 0.5)
+                features["baths_full"] + features["baths_half"] * 0.5
             ),
-            "Garage Spaces": _numeric_property(int(features["garage_spaces"])),
-            "Size (sq. ft.)": _numeric_property(float(features["living_area"])),
-            "Lot Size (sq. ft.)": _numeric_property(float(features["lot_area"])),
-            "Year Built": _numeric_property(int(features["year_built"])),
+            "Garage Spaces": _numeric_property(features["garage_spaces"]),
+            "Size (sq. ft.)": _numeric_property(features["living_area"]),
+            "Lot Size (sq. ft.)": _numeric_property(features["lot_area"]),
+            "Year Built": _numeric_property(features["year_built"]),
         }
 
         # Child blocks
@@ -150,8 +204,17 @@ class NotionRealEstateDB:
             "children": children,
         }
 
-    def get_existing_listing(self, address: str) -> Optional[str]:
-        """Check that listing exists in database. Assumes 'Address' is unique."""
+    def get_existing_listing(
+        self, address: str, link: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Check that listing exists in database. Matches on normalized address or listing
+        URL first, then falls back to an exact 'Address' match.
+        """
+        existing = self.address_index.get(address, link)
+        if existing and existing[0]:
+            return existing[0]
+
         response = requests.post(
             f"{self.database_url}/query",
             data=json.dumps(
@@ -171,14 +234,14 @@ class NotionRealEstateDB:
                 return results[0]["id"]
         return None
 
-    def update_existing_listing(self, listing_features: Dict, page_id: str):
+    def update_existing_listing(self, listing_features: ListingRecord, page_id: str):
 
         # Only update page if listing price changed
         response = requests.get(f"{self.page_url}/{page_id}", headers=NOTION_HEADERS)
         existing_list_price = float(
             response.json().get("properties").get("Listing Price").get("number")
         )
-        if existing_list_price == float(listing_features["list_price"]):
+        if existing_list_price == listing_features["list_price"]:
             logger.info("Unchanged listing, won't update")
             return
 
@@ -190,42 +253,91 @@ class NotionRealEstateDB:
             del block["object"]
             del block["type"]
 
+        if self.write_queue is not None:
+            logger.info("Queueing page update")
+            self.write_queue.update_properties(page_id, payload_properties)
+            self.write_queue.replace_children(page_id, payload_children)
+        else:
+            self.patch_page_properties(page_id, payload_properties).raise_for_status()
+            for response in self.replace_page_children(page_id, payload_children):
+                response.raise_for_status()
+
+        # Only record the new price once the write has been accepted or queued
+        self.address_index.add(
+            listing_features["address"],
+            page_id=page_id,
+            list_price=listing_features["list_price"],
+            link=listing_features["link"],
+        )
+
+    def add_new_listing(self, listing_features: ListingRecord):
+        payload = self._make_listing_payload(listing_features)
+        payload["parent"] = {"database_id": self.database_id}
+        if self.write_queue is not None:
+            logger.info("Queueing page creation")
+            self.write_queue.create_page(
+                address_key(listing_features["address"]) or listing_features["address"],
+                payload,
+            )
+            page_id = None
+        else:
+            response = self.create_page(payload)
+            response.raise_for_status()
+            page_id = response.json()["id"]
+        self.address_index.add(
+            listing_features["address"],
+            page_id=page_id,
+            list_price=listing_features["list_price"],
+            link=listing_features["link"],
+        )
+
+    def create_page(self, payload: Dict) -> requests.Response:
+        """Create a page, including any inline child blocks in the payload"""
+        return requests.post(
+            f"{self.page_url}", headers=NOTION_HEADERS, data=json.dumps(payload)
+        )
+
+    def patch_page_properties(
+        self, page_id: str, properties: Dict
+    ) -> requests.Response:
         logger.info("Updating page properties")
-        response = requests.patch(
+        return requests.patch(
             f"{self.page_url}/{page_id}",
             headers=NOTION_HEADERS,
-            data=json.dumps({"properties": payload_properties}),
+            data=json.dumps({"properties": properties}),
         )
-        response.raise_for_status()
 
+    def replace_page_children(
+        self, page_id: str, children: List[Dict]
+    ) -> Iterator[requests.Response]:
+        """
+        Delete all child blocks of a page and append new ones. Yields each response
+        as it is made so the caller can stop on the first failure.
+        """
         logger.info("Deleting child blocks")
-        child_blocks = requests.get(
+        response = requests.get(
             f"{self.block_url}/{page_id}/children", headers=NOTION_HEADERS
-        ).json()["results"]
-        for block_id in [block["id"] for block in child_blocks]:
-            requests.delete(f"{self.block_url}/{block_id}", headers=NOTION_HEADERS)
+        )
+        yield response
+        for block_id in [block["id"] for block in response.json()["results"]]:
+            yield requests.delete(
+                f"{self.block_url}/{block_id}", headers=NOTION_HEADERS
+            )
 
         logger.info("Adding updated child blocks")
-        response = requests.patch(
+        yield requests.patch(
             f"{self.block_url}/{page_id}/children",
             headers=NOTION_HEADERS,
-            data=json.dumps({"children": payload_children}),
-        )
-        response.raise_for_status()
-
-    def add_new_listing(self, listing_features: Dict):
-        payload = self._make_listing_payload(listing_features)
-        payload["parent"] = {"database_id": self.database_id}
-        response = requests.post(
-            f"{self.page_url}", headers=NOTION_HEADERS, data=json.dumps(payload)
+            data=json.dumps({"children": children}),
         )
-        response.raise_for_status()
 
     def add_listing(self, listing: Listing):
         """
         Adds a listing to the database. If the listing exists, updates that listing
         """
-        existing_listing = self.get_existing_listing(listing.features["address"])
+        existing_listing = self.get_existing_listing(
+            listing.features["address"], listing.features["link"]
+        )
         if existing_listing:
             logger.info(f"Found existing listing with page id {existing_listing}")
             self.update_existing_listing(listing.features, existing_listing)
@@ -0,0 +1,185 @@
+"""Typed listing records
+
+`ListingRecord` holds the parsed features of a single listing in fixed slots, coercing
+each field to its type once at parse time. It implements the mutable mapping interface
+so it can be used anywhere a feature dictionary was expected.
+
+`ListingBatch` collects many records column-wise in typed buffers and hands them off
+as NumPy arrays for training and scoring.
+"""
+import sys
+from array import array
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from trulia_to_notion.constants import FEATURES
+
+# Field types, in record order
+LISTING_FIELDS = {
+    "address": str,
+    "street_address": str,
+    "city": str,
+    "state": str,
+    "zip_code": str,
+    "link": str,
+    "list_price": float,
+    "beds": int,
+    "baths_full": int,
+    "baths_half": int,
+    "garage_spaces": int,
+    "living_area": float,
+    "lot_area": float,
+    "year_built": int,
+    "property_description": str,
+    "raw_feature_notes": str,
+}
+
+# Fields every listing must have; the rest default to zero or an empty string
+REQUIRED_FIELDS = (
+    "address",
+    "street_address",
+    "city",
+    "state",
+    "zip_code",
+    "list_price",
+)
+
+# Fields with few distinct values, interned so records share a single string object
+INTERNED_FIELDS = ("city", "state", "zip_code")
+
+
+def _coerce(field: str, value):
+    field_type = LISTING_FIELDS[field]
+    if value is None or value == "":
+        if field in REQUIRED_FIELDS:
+            raise ValueError(f"Missing required listing field {field!r}")
+        return field_type()
+    if field_type is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"Non-integral value {value!r} for listing field {field!r}")
+    value = field_type(value)
+    if field in INTERNED_FIELDS:
+        value = sys.intern(value)
+    return value
+
+
+class ListingRecord(MutableMapping):
+    """
+    Listing features with a fixed set of typed fields
+
+    Missing `REQUIRED_FIELDS` and values that can't be converted to a field's type
+    without loss raise ValueError. Keys outside `LISTING_FIELDS` are accepted and kept,
+    uncoerced, in a regular dictionary alongside the slots; they are not carried over
+    into `ListingBatch`. The fixed fields are always present and can't be deleted.
+    """
+
+    __slots__ = (*LISTING_FIELDS, "_extra")
+
+    def __init__(self, **features):
+        self._extra = None
+        for field in LISTING_FIELDS:
+            setattr(self, field, _coerce(field, features.pop(field, None)))
+        if features:
+            self._extra = features
+
+    @property
+    def baths(self) -> float:
+        """Total bathrooms, counting half baths as 0.5"""
+        return self.baths_full + self.baths_half * 0.5
+
+    def __getitem__(self, field: str):
+        if field in LISTING_FIELDS:
+            return getattr(self, field)
+        if self._extra is None:
+            raise KeyError(field)
+        return self._extra[field]
+
+    def __setitem__(self, field: str, value):
+        if field in LISTING_FIELDS:
+            setattr(self, field, _coerce(field, value))
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[field] = value
+
+    def __delitem__(self, field: str):
+        if field in LISTING_FIELDS:
+            raise KeyError(f"Can't delete fixed listing field {field!r}")
+        if self._extra is None:
+            raise KeyError(field)
+        del self._extra[field]
+
+    def __iter__(self):
+        yield from LISTING_FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return len(LISTING_FIELDS) + len(self._extra or ())
+
+    def copy(self) -> "ListingRecord":
+        return ListingRecord(**self)
+
+    def __repr__(self):
+        return f"ListingRecord(address={self.address!r}, link={self.link!r})"
+
+
+_ARRAY_TYPECODES = {int: "q", float: "d"}
+
+
+class ListingBatch:
+    """Column-wise collection of listing records"""
+
+    def __init__(self, records: Optional[Iterable[ListingRecord]] = None):
+        self._columns = {
+            field: array(_ARRAY_TYPECODES[field_type])
+            if field_type in _ARRAY_TYPECODES
+            else []
+            for field, field_type in LISTING_FIELDS.items()
+        }
+        for record in records or ():
+            self.append(record)
+
+    def __len__(self):
+        return len(self._columns["address"])
+
+    def append(self, record: ListingRecord):
+        for field, column in self._columns.items():
+            column.append(getattr(record, field))
+
+    def clear(self):
+        for column in self._columns.values():
+            del column[:]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Return each field as a NumPy array. Numeric columns are copied once."""
+        return {
+            field: np.array(column, dtype=np.dtype(column.typecode))
+            if isinstance(column, array)
+            else np.array(column, dtype=object)
+            for field, column in self._columns.items()
+        }
+
+    def feature_matrix(self) -> np.ndarray:
+        """Model input matrix with columns in `constants.FEATURES` order"""
+        arrays = self.to_arrays()
+        columns = {
+            "Listing Price": arrays["list_price"],
+            "Beds": arrays["beds"],
+            "Baths": arrays["baths_full"] + arrays["baths_half"] * 0.5,
+            "Garage Spaces": arrays["garage_spaces"],
+            "Size (sq. ft.)": arrays["living_area"],
+            "Lot Size (sq. ft.)": arrays["lot_area"],
+            "Zip Code": arrays["zip_code"].astype(np.int64),
+        }
+        return np.column_stack([columns[feature] for feature in FEATURES]).astype(
+            np.float64
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame of model features and addresses, as accepted by `classify`"""
+        data = pd.DataFrame(self.feature_matrix(), columns=list(FEATURES))
+        data.insert(0, "Address", self._columns["address"])
+        return data
@@ -2,11 +2,13 @@ import json
 import logging
 import re
 from pathlib import Path
-from typing import Dict, List, Mapping, Optional, Union
+from typing import List, Mapping, Optional, Union
 
 from bs4 import BeautifulSoup
 
+from trulia_to_notion.address import AddressIndex, address_key
 from trulia_to_notion.features import feature_parser
+from trulia_to_notion.record import ListingRecord
 from trulia_to_notion.util import random_request
 
 logger = logging.getLogger(__name__)
@@ -25,12 +27,14 @@ class Listing:
         self._features = self.parse_listing(document, link)
 
     @property
-    def features(self):
-        """Return feature dictionary of Listing"""
+    def features(self) -> ListingRecord:
+        """Return feature record of Listing"""
         return self._features
 
     @features.setter
-    def features(self, features: Dict):
+    def features(self, features: Mapping):
+        if not isinstance(features, ListingRecord):
+            features = ListingRecord(**features)
         self._features = features
 
     @staticmethod
@@ -83,7 +87,9 @@ class Listing:
         parsed_features["raw_feature_notes"] = ";".join(raw_feature_notes)
         return parsed_features
 
-    def parse_listing(self, document: BeautifulSoup, link: Optional[str] = None):
+    def parse_listing(
+        self, document: BeautifulSoup, link: Optional[str] = None
+    ) -> ListingRecord:
         """Parse listing document for features"""
 
         logger.info(f"Parsing listing {link}")
@@ -103,26 +109,10 @@ class Listing:
         ]
         parsed_features = self._format_listing_features(all_features)
 
-        # Default features
-        features = {
-            "address": "",
-            "baths_full": 0,
-            "baths_half": 0,
-            "beds": 0,
-            "garage_spaces": 0,
-            "link": "",
-            "list_price": 0.0,
-            "living_area": 0.0,
-            "lot_area": 0.0,
-            "property_description": "",
-            "raw_feature_notes": "",
-            "year_built": 0,
-        }
-        features["link"] = link
-        features.update(list_price)
-        features.update(listing_description)
-        features.update(parsed_features)
-        return features
+        # Optional fields not found in the document default to zero or empty
+        return ListingRecord(
+            link=link, **list_price, **listing_description, **parsed_features
+        )
 
 
 class TruliaConnection:
@@ -144,35 +134,115 @@ class TruliaConnection:
         document = BeautifulSoup(response.text, "html.parser")
         return document
 
-    @staticmethod
-    def retrieve_listings_links(base_url: str, document: BeautifulSoup):
+    @classmethod
+    def retrieve_listings_links(cls, base_url: str, document: BeautifulSoup):
         """Extract property links from listings from HTML document"""
-        listing_links = [
-            f"{base_url}{listing['href']}"
-            for listing in document.find_all(
-                attrs={"data-testid": "property-card-link"}, href=True
-            )
-        ]
-        return listing_links
+        return [card["link"] for card in cls.retrieve_listing_cards(base_url, document)]
+
+    @staticmethod
+    def _get_card_container(listing: BeautifulSoup) -> BeautifulSoup:
+        """Outermost ancestor of a card link that contains no other card's link"""
+        card = listing
+        for parent in listing.parents:
+            if len(parent.find_all(attrs={"data-testid": "property-card-link"})) != 1:
+                break
+            card = parent
+        return card
 
-    def get_listings(self, query_url: str, max_listings: int):
-        """Get listings from Trulia query URL"""
+    @staticmethod
+    def _get_card_text(card: BeautifulSoup, test_id: str) -> Optional[str]:
+        element = card.find(attrs={"data-testid": test_id})
+        return element.text.strip() if element else None
+
+    @classmethod
+    def retrieve_listing_cards(cls, base_url: str, document: BeautifulSoup):
+        """
+        Extract property links, addresses and prices from listing cards in HTML
+        document. Address and price are None where the card doesn't include them.
+        """
+        listing_cards = []
+        for listing in document.find_all(
+            attrs={"data-testid": "property-card-link"}, href=True
+        ):
+            card = cls._get_card_container(listing)
+            address = None
+            list_price = None
+            street = cls._get_card_text(card, "property-street")
+            region = cls._get_card_text(card, "property-region")
+            if street and region:
+                address = f"{street}, {region}"
+            price = cls._get_card_text(card, "property-price")
+            price_match = re.search(r"\$([\d,]+)", price or "")
+            if price_match:
+                list_price = float(price_match.group(1).replace(",", ""))
+            listing_cards.append(
+                {
+                    "link": f"{base_url}{listing['href']}",
+                    "address": address,
+                    "list_price": list_price,
+                }
+            )
+        return listing_cards
+
+    def get_listings(
+        self,
+        query_url: str,
+        max_listings: int,
+        index: Optional[AddressIndex] = None,
+    ):
+        """
+        Get listings from Trulia query URL
+
+        Listings are deduplicated on normalized address before fetching. If an index of
+        existing listings is given, listings already in it at an unchanged price are
+        skipped as well.
+        """
         if self.query_document:
             with open(self.query_document, "r") as query_document_fh:
                 search_document = BeautifulSoup(query_document_fh, "html.parser")
         else:
             search_document = self.get_document(query_url)
 
-        listing_links = self.retrieve_listings_links(self.base_url, search_document)
-        logger.info(f"Got the following links: {listing_links}")
+        listing_cards = self.retrieve_listing_cards(self.base_url, search_document)
+        logger.info(f"Got the following links: {[c['link'] for c in listing_cards]}")
         listings = []
-        for listing_link in listing_links[:max_listings]:
+        seen_links = set()
+        seen_addresses = set()
+        for card in listing_cards[:max_listings]:
+            listing_link = card["link"]
+            card_key = address_key(card["address"]) if card["address"] else None
+            if listing_link in seen_links or (card_key and card_key in seen_addresses):
+                logger.info(f"Skipping duplicate listing {listing_link=}")
+                continue
+            seen_links.add(listing_link)
+            if card_key:
+                seen_addresses.add(card_key)
+
+            existing = None
+            if index is not None:
+                existing = index.get(card["address"], listing_link)
+            if (
+                existing
+                and card["list_price"] is not None
+                and existing[1] == card["list_price"]
+            ):
+                logger.info(f"Unchanged listing, won't fetch {listing_link=}")
+                continue
+
             try:
-                listings.append(Listing(self.get_document(listing_link), listing_link))
+                listing = Listing(self.get_document(listing_link), listing_link)
             except Exception:
                 logger.error(
                     f"Error retrieving listing information for {listing_link=}"
                 )
                 continue
+
+            listing_key = address_key(listing.features["address"])
+            if listing_key and listing_key != card_key:
+                if listing_key in seen_addresses:
+                    logger.info(f"Skipping duplicate listing {listing_link=}")
+                    continue
+                seen_addresses.add(listing_key)
+            listings.append(listing)
         self._listings = listings
         return listings